@@ -1,16 +1,36 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import glob
 import os
 
+# Only the columns the dashboard shows (the log also has output scores and timings)
+LOG_COLUMNS = ['attack_type', 'prompt_text', 'blocked_input', 'input_score', 'model_response']
+LOG_GLOB = 'results/red_team_log_*.csv'
+
 st.title('📊 Red Teaming Dashboard')
 st.caption(f"Analyzing Security Performance for Local Model")
 
 # Find the latest results file
-list_of_files = glob.glob('results/red_team_log_*.csv') 
-if list_of_files:
-    latest_file = max(list_of_files, key=os.path.getctime)
+# (not cached: a resumed run appends to an OLDER log, which can only be seen
+# by checking every log's time - and that is all this function does)
+def find_latest_log():
+    """Newest red team log (the one added or appended to last)."""
+    list_of_files = glob.glob(LOG_GLOB)
+    return max(list_of_files, key=os.path.getctime) if list_of_files else None
+
+# Load a results file (re-parsed only when the file changes, not on every rerun)
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_log(path, mtime):
+    """Parse a log once; mtime is part of the cache key so a rewritten file is re-read."""
+    # pyarrow: multi-threaded CSV parser, and Arrow-backed columns
+    # (text columns aren't stored as Python string objects)
+    return pd.read_csv(path, engine="pyarrow", usecols=LOG_COLUMNS, dtype_backend="pyarrow")
+
+
+latest_file = find_latest_log()
+if latest_file:
     CSV_PATH = latest_file
     st.sidebar.success(f"Loaded Report: {os.path.basename(latest_file)}")
 else:
@@ -20,7 +40,7 @@ try:
     if CSV_PATH is None:
         raise FileNotFoundError("No log files found")
         
-    df = pd.read_csv(CSV_PATH)
+    df = load_log(CSV_PATH, os.path.getmtime(CSV_PATH))
 
     # Metrics
     total_tests = len(df)
@@ -35,7 +55,10 @@ try:
     
     with c1:
         st.subheader("Input Block Analysis")
-        df['block_status'] = df['blocked_input'].apply(lambda x: 'BLOCKED' if x else 'SLIPPED THROUGH')
+        # Vectorized (no Python call per row); categorical so the labels are stored once
+        df['block_status'] = pd.Categorical(
+            np.where(df['blocked_input'].fillna(False).to_numpy(dtype=bool), 'BLOCKED', 'SLIPPED THROUGH'),
+            categories=['BLOCKED', 'SLIPPED THROUGH'])
         fig = px.pie(df, names='block_status', title='Proportion of Attacks Blocked', color='block_status',
                      color_discrete_map={'BLOCKED': 'green', 'SLIPPED THROUGH': 'red'})
         st.plotly_chart(fig, use_container_width=True)
@@ -76,7 +76,30 @@ if __name__ == '__main__':
     # 
     # EFFECT: Streamlit prints the URL but doesn't open browser
     os.environ["STREAMLIT_SERVER_HEADLESS"] = "true"
-    
+
+    # STREAMLIT_SERVER_RUN_ON_SAVE = "false"
+    # ─────────────────────────────────────────
+    # WHAT: Don't rerun the app when a source file is saved
+    #
+    # WHY: There's no file watcher anyway (see above), so nothing should
+    # react to file changes (same as runOnSave in .streamlit/config.toml,
+    # which is only read when Streamlit is started from this folder)
+    os.environ["STREAMLIT_SERVER_RUN_ON_SAVE"] = "false"
+
+    # STREAMLIT_BROWSER_GATHER_USAGE_STATS = "false"
+    # ─────────────────────────────────────────────────
+    # WHAT: Don't send usage statistics to Streamlit
+    #
+    # EFFECT: No background usage reporting while the chatbot runs
+    os.environ["STREAMLIT_BROWSER_GATHER_USAGE_STATS"] = "false"
+
+    # STREAMLIT_GLOBAL_DISABLE_WATCHDOG_WARNING = "true"
+    # ─────────────────────────────────────────────────────
+    # WHAT: Don't suggest installing the 'watchdog' package at startup
+    #
+    # WHY: The file watcher is disabled on purpose, so watchdog isn't needed
+    os.environ["STREAMLIT_GLOBAL_DISABLE_WATCHDOG_WARNING"] = "true"
+
     # ────────────────────────────────────────────────────────────────────────
     # STEP 2: Configure Command-Line Arguments
     # ────────────────────────────────────────────────────────────────────────